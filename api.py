@@ -1,4 +1,6 @@
 # api.py
+import asyncio
+import threading
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from workflow_backend import engine
@@ -9,21 +11,36 @@ class StepInput(BaseModel):
 
 app = FastAPI()
 
+# Streamlit re-executes ui.py per rerun and per session, but this module is
+# imported once per process, so the server-thread guard lives here
+_api_thread_lock = threading.Lock()
+_api_thread_started = False
+
+def start_api_thread(target) -> None:
+    global _api_thread_started
+    with _api_thread_lock:
+        if _api_thread_started:
+            return
+        threading.Thread(target=target, daemon=True).start()
+        _api_thread_started = True
+
+# Steps a human may complete through the REST API
+_HUMAN_ALLOWED = frozenset(("Gather Claim Info", "Validate Request"))
+
+# Engine calls are blocking, so push them off the event loop
 @app.post("/workflow/{instance_id}/human-step")
-def provide_human_input(instance_id: str, step_input: StepInput):
-    meta = engine.get_meta(instance_id)
+async def provide_human_input(instance_id: str, step_input: StepInput):
+    meta = await asyncio.to_thread(engine.get_meta, instance_id)
     if not meta:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    allowed_steps = {"Gather Claim Info", "Validate Request"}
-    if meta.last_node not in allowed_steps:
+    if meta.last_node not in _HUMAN_ALLOWED:
         raise HTTPException(status_code=400, detail=f"Current step '{meta.last_node}' is not allowed via API")
 
-    result = engine.resume(instance_id, step_input.actor, step_input.updates)
+    result = await asyncio.to_thread(engine.resume, instance_id, step_input.actor, step_input.updates)
     return {"instance_id": instance_id, "result": result}
 
 @app.get("/workflow/pending-human")
-def pending_human_steps():
-    allowed_steps = {"Gather Claim Info", "Validate Request"}
-    metas = engine.list_instances(status="paused")
-    return [m.to_dict() for m in metas if m.last_node in allowed_steps]
\ No newline at end of file
+async def pending_human_steps():
+    metas = await asyncio.to_thread(engine.list_instances, status="paused", last_node_in=_HUMAN_ALLOWED)
+    return [m.to_dict() for m in metas]
\ No newline at end of file
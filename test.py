@@ -1,13 +1,15 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional, List, Tuple
-from dataclasses import dataclass, asdict, field
+from typing import AbstractSet, Deque, Dict, Any, Optional, List, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+import bisect
+import threading
 import uuid
 
 from langgraph.graph import StateGraph, END
 from langgraph.store.memory import InMemoryStore
 from langgraph.types import Interrupt
-from IPython.display import Image, display
 
 # ==========
 # Utilities
@@ -15,10 +17,13 @@ from IPython.display import Image, display
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
+# Only the most recent steps are kept per workflow
+STEPS_HISTORY_MAX = 64
+
 # ==========
 # Audit metadata model
 # ==========
-@dataclass
+@dataclass(slots=True)
 class InstanceMeta:
     instance_id: str
     customer_id: str
@@ -29,132 +34,147 @@ class InstanceMeta:
     last_node: Optional[str] = None
     start_time: Optional[str] = None
     end_time: Optional[str] = None
-    steps_history: List[Dict[str, Any]] = field(default_factory=list)  # [{ts, node, actor, status}]
+    steps_history: Deque[Dict[str, Any]] = field(
+        default_factory=lambda: deque(maxlen=STEPS_HISTORY_MAX)
+    )  # [{ts, node, actor, status}], newest STEPS_HISTORY_MAX only
+    last_ts: Optional[str] = None  # ts of the newest step
 
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        # Shallow copy: history entries are never mutated after being appended
+        return {
+            "instance_id": self.instance_id,
+            "customer_id": self.customer_id,
+            "workflow_name": self.workflow_name,
+            "started_by": self.started_by,
+            "last_actor": self.last_actor,
+            "status": self.status,
+            "last_node": self.last_node,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "steps_history": list(self.steps_history),
+            "last_ts": self.last_ts,
+        }
+
+    def copy(self) -> "InstanceMeta":
+        return InstanceMeta(
+            instance_id=self.instance_id,
+            customer_id=self.customer_id,
+            workflow_name=self.workflow_name,
+            started_by=self.started_by,
+            last_actor=self.last_actor,
+            status=self.status,
+            last_node=self.last_node,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            steps_history=deque(self.steps_history, maxlen=STEPS_HISTORY_MAX),
+            last_ts=self.last_ts,
+        )
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "InstanceMeta":
-        return InstanceMeta(**d)
+        return InstanceMeta(
+            instance_id=d["instance_id"],
+            customer_id=d["customer_id"],
+            workflow_name=d["workflow_name"],
+            started_by=d["started_by"],
+            last_actor=d.get("last_actor"),
+            status=d.get("status", "in_progress"),
+            last_node=d.get("last_node"),
+            start_time=d.get("start_time"),
+            end_time=d.get("end_time"),
+            steps_history=deque(d.get("steps_history") or [], maxlen=STEPS_HISTORY_MAX),
+            last_ts=d.get("last_ts"),
+        )
 
 # ==========
-# Workflow definition with Interrupt guards
+# Routing table: node -> (bag key, bag value -> next node)
+# Any other value ends the run.
 # ==========
-def build_claim_workflow():
-    def ensure_defaults(s: Dict[str, Any]) -> None:
-        s.setdefault("bag", {})
-        s.setdefault("meta", {})
-        s["meta"].setdefault("status", "in_progress")
-        s["meta"].setdefault("start_time", now_iso())
-
-    def validate_request(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Validate Request"
-        if "validate" not in s["bag"]:
-            return Interrupt("Validate request? (yes/no)")
-        return s
-
-    def gather_claim_info(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Gather Claim Info"
-        if "claim_details" not in s["bag"]:
-            return Interrupt("Provide claim details")
-        return s
-
-    def identify_accounts(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Identify Accounts & Process Decision"
-        if "process_decision" not in s["bag"]:
-            return Interrupt("Decision? cancel / hold / suppress")
-        return s
-
-    def cancel_request(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Cancel CWD Request"
-        s["meta"]["status"] = "aborted"
-        s["meta"]["end_time"] = now_iso()
-        s["bag"]["result"] = "Workflow aborted."
-        return s
-
-    def hold_request(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Hold Request"
-        if "hold_action" not in s["bag"]:
-            return Interrupt("Workflow on hold. Command: resume / abort")
-        return s
+_ROUTE_TABLE: Dict[str, Tuple[str, Dict[str, str]]] = {
+    "Validate Request": ("validate", {"yes": "Gather Claim Info", "no": "Cancel CWD Request"}),
+    "Identify Accounts & Process Decision": ("process_decision", {
+        "cancel": "Cancel CWD Request",
+        "hold": "Hold Request",
+        "suppress": "Apply Temporary Suppression",
+    }),
+    "Hold Request": ("hold_action", {"resume": "Apply Temporary Suppression", "abort": "Cancel CWD Request"}),
+    "Apply Temporary Suppression": ("proceed_fulfill", {"yes": "Fulfill Case and Detect", "no": "Cancel CWD Request"}),
+}
+
+def _router(node: str):
+    bag_key, routes = _ROUTE_TABLE[node]
+    def route(s):
+        return END if isinstance(s, Interrupt) else routes.get(s["bag"].get(bag_key), END)
+    return route
+
+def _route_claim_info(s):
+    return END if isinstance(s, Interrupt) else (
+        "Identify Accounts & Process Decision" if s["bag"].get("claim_details") else END
+    )
 
-    def apply_suppression(s: Dict[str, Any]):
-        ensure_defaults(s)
-        s["meta"]["last_node"] = "Apply Temporary Suppression"
-        if "proceed_fulfill" not in s["bag"]:
-            return Interrupt("Proceed to fulfill? (yes/no)")
-        return s
+# node -> router for every conditional edge; other nodes go straight to END
+_ROUTERS = {"Gather Claim Info": _route_claim_info, **{node: _router(node) for node in _ROUTE_TABLE}}
 
-    def fulfill_case(s: Dict[str, Any]):
+# ==========
+# Node specs: (name, required bag key, prompt, terminal status, result)
+# HITL nodes interrupt until their bag key is set; terminal nodes close the run.
+# ==========
+NODE_SPECS: List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]] = [
+    ("Validate Request", "validate", "Validate request? (yes/no)", None, None),
+    ("Gather Claim Info", "claim_details", "Provide claim details", None, None),
+    ("Identify Accounts & Process Decision", "process_decision", "Decision? cancel / hold / suppress", None, None),
+    ("Cancel CWD Request", None, None, "aborted", "Workflow aborted."),
+    ("Hold Request", "hold_action", "Workflow on hold. Command: resume / abort", None, None),
+    ("Apply Temporary Suppression", "proceed_fulfill", "Proceed to fulfill? (yes/no)", None, None),
+    ("Fulfill Case and Detect", None, None, "completed", "Fulfilled and detection complete."),
+]
+
+def ensure_defaults(s: Dict[str, Any]) -> None:
+    s.setdefault("bag", {})
+    s.setdefault("meta", {})
+    s["meta"].setdefault("status", "in_progress")
+    s["meta"].setdefault("start_time", now_iso())
+
+def make_hitl_node(
+    name: str,
+    bag_key: Optional[str],
+    prompt: Optional[str],
+    terminal_status: Optional[str],
+    result: Optional[str],
+):
+    def fn(s: Dict[str, Any]):
         ensure_defaults(s)
-        s["meta"]["last_node"] = "Fulfill Case and Detect"
-        s["meta"]["status"] = "completed"
-        s["meta"]["end_time"] = now_iso()
-        s["bag"]["result"] = "Fulfilled and detection complete."
+        s["meta"]["last_node"] = name
+        if terminal_status:
+            s["meta"]["status"] = terminal_status
+            s["meta"]["end_time"] = now_iso()
+            s["bag"]["result"] = result
+            return s
+        if bag_key not in s["bag"]:
+            return Interrupt(prompt)
         return s
+    return fn
 
+# ==========
+# Workflow definition with Interrupt guards
+# ==========
+def build_claim_workflow():
     g = StateGraph(dict)
-    g.add_node("Validate Request", validate_request)
-    g.add_node("Gather Claim Info", gather_claim_info)
-    g.add_node("Identify Accounts & Process Decision", identify_accounts)
-    g.add_node("Cancel CWD Request", cancel_request)
-    g.add_node("Hold Request", hold_request)
-    g.add_node("Apply Temporary Suppression", apply_suppression)
-    g.add_node("Fulfill Case and Detect", fulfill_case)
+    for spec in NODE_SPECS:
+        g.add_node(spec[0], make_hitl_node(*spec))
 
     g.set_entry_point("Validate Request")
 
     # Conditional edges with Interrupt guards (return END when paused)
-    g.add_conditional_edges(
-        "Validate Request",
-        lambda s: END if isinstance(s, Interrupt) else (
-            "Gather Claim Info" if s["bag"].get("validate") == "yes"
-            else "Cancel CWD Request" if s["bag"].get("validate") == "no"
-            else END
-        ),
-        {"Gather Claim Info": "Gather Claim Info", "Cancel CWD Request": "Cancel CWD Request", END: END},
-    )
     g.add_conditional_edges(
         "Gather Claim Info",
-        lambda s: END if isinstance(s, Interrupt) else (
-            "Identify Accounts & Process Decision" if s["bag"].get("claim_details") else END
-        ),
+        _ROUTERS["Gather Claim Info"],
         {"Identify Accounts & Process Decision": "Identify Accounts & Process Decision", END: END},
     )
-    g.add_conditional_edges(
-        "Identify Accounts & Process Decision",
-        lambda s: END if isinstance(s, Interrupt) else (
-            "Cancel CWD Request" if s["bag"].get("process_decision") == "cancel"
-            else "Hold Request" if s["bag"].get("process_decision") == "hold"
-            else "Apply Temporary Suppression" if s["bag"].get("process_decision") == "suppress"
-            else END
-        ),
-        {"Cancel CWD Request": "Cancel CWD Request", "Hold Request": "Hold Request", "Apply Temporary Suppression": "Apply Temporary Suppression", END: END},
-    )
-    g.add_conditional_edges(
-        "Hold Request",
-        lambda s: END if isinstance(s, Interrupt) else (
-            "Apply Temporary Suppression" if s["bag"].get("hold_action") == "resume"
-            else "Cancel CWD Request" if s["bag"].get("hold_action") == "abort"
-            else END
-        ),
-        {"Apply Temporary Suppression": "Apply Temporary Suppression", "Cancel CWD Request": "Cancel CWD Request", END: END},
-    )
-    g.add_conditional_edges(
-        "Apply Temporary Suppression",
-        lambda s: END if isinstance(s, Interrupt) else (
-            "Fulfill Case and Detect" if s["bag"].get("proceed_fulfill") == "yes"
-            else "Cancel CWD Request" if s["bag"].get("proceed_fulfill") == "no"
-            else END
-        ),
-        {"Fulfill Case and Detect": "Fulfill Case and Detect", "Cancel CWD Request": "Cancel CWD Request", END: END},
-    )
+    for node, (_, routes) in _ROUTE_TABLE.items():
+        path_map = {target: target for target in routes.values()}
+        path_map[END] = END
+        g.add_conditional_edges(node, _ROUTERS[node], path_map)
     g.add_edge("Fulfill Case and Detect", END)
     g.add_edge("Cancel CWD Request", END)
 
@@ -166,26 +186,60 @@ def build_claim_workflow():
 class Engine:
     STATE_NS = "workflow_state"
     META_NS = "workflow_meta"
-    EVENTS_NS = "workflow_events"
-    INDEX_NS = "workflow_index"
+    EVENTS_NS = "workflow_events"  # f"{instance_id}:{seq}" -> event
+    EVENTS_SEQ_NS = "workflow_events_seq"  # instance_id -> next seq
+    INDEX_BY_STATUS_NS = "workflow_index_by_status"
+    INDEX_BY_CUSTOMER_NS = "workflow_index_by_customer"
+    INDEX_BY_RECENCY_NS = "workflow_index_by_recency"
+    META_CACHE_SIZE = 1024
+    SCAN_PAGE_SIZE = 1000
 
     def __init__(self, store: InMemoryStore, workflow_name: str = "ClaimWorkflow"):
         self.store = store
         self.workflow_name = workflow_name
         self.graph = build_claim_workflow()
-        #grap = self.graph
-        #display(Image(grap.get_graph().draw_mermaid_png()))
+        # Node callables by name, for resuming at the interrupted node
+        self._nodes = {spec[0]: make_hitl_node(*spec) for spec in NODE_SPECS}
+        self._bag_keys = {spec[0]: spec[1] for spec in NODE_SPECS}
+        # Write-through LRU of hydrated metas (single-process store).
+        # Only _put_meta and cache misses write it; readers get copies.
+        self._meta_cache: "OrderedDict[str, InstanceMeta]" = OrderedDict()
+        self._meta_cache_lock = threading.Lock()
+        # Serializes _put_meta's read-diff-write of meta and the shared indexes
+        self._index_lock = threading.Lock()
 
     # Unwrap Item.value from store.get()
     def _unwrap(self, item):
         return item.value if item else None
 
     # Index helpers
-    def _add_to_index(self, instance_id: str) -> None:
-        idx = self._unwrap(self.store.get(self.INDEX_NS, "instances")) or []
+    # Secondary indexes map key -> {instance_id: True} for O(1) add/remove.
+    # Callers must hold _index_lock.
+    def _index_add(self, ns: str, key: str, instance_id: str) -> None:
+        idx = self._unwrap(self.store.get(ns, key)) or {}
         if instance_id not in idx:
-            idx.append(instance_id)
-            self.store.put(self.INDEX_NS, "instances", idx)
+            idx[instance_id] = True
+            self.store.put(ns, key, idx)
+
+    def _index_remove(self, ns: str, key: str, instance_id: str) -> None:
+        idx = self._unwrap(self.store.get(ns, key)) or {}
+        if idx.pop(instance_id, None) is not None:
+            self.store.put(ns, key, idx)
+
+    # Recency index: (last step ts, instance_id) pairs kept sorted ascending.
+    # Callers must hold _index_lock.
+    def _update_recency(self, instance_id: str, prev_ts: Optional[str], ts: str) -> None:
+        idx = self._unwrap(self.store.get(self.INDEX_BY_RECENCY_NS, "instances")) or []
+        if prev_ts is not None:
+            pos = bisect.bisect_left(idx, (prev_ts, instance_id))
+            if pos < len(idx) and idx[pos] == (prev_ts, instance_id):
+                del idx[pos]
+        bisect.insort(idx, (ts, instance_id))
+        self.store.put(self.INDEX_BY_RECENCY_NS, "instances", idx)
+
+    def _recency_snapshot(self) -> List[Tuple[str, str]]:
+        with self._index_lock:
+            return list(self._unwrap(self.store.get(self.INDEX_BY_RECENCY_NS, "instances")) or [])
 
     # Event log
     def _append_event(
@@ -196,10 +250,11 @@ class Engine:
         status: str,
         actor: Optional[str],
         data: Dict[str, Any],
+        _now: Optional[str] = None,
     ) -> None:
-        events = self._unwrap(self.store.get(self.EVENTS_NS, instance_id)) or []
-        events.append({
-            "ts": now_iso(),
+        seq = self._unwrap(self.store.get(self.EVENTS_SEQ_NS, instance_id)) or 0
+        self.store.put(self.EVENTS_NS, f"{instance_id}:{seq}", {
+            "ts": _now or now_iso(),
             "instance_id": instance_id,
             "event": event,
             "node": node,
@@ -207,43 +262,84 @@ class Engine:
             "actor": actor,
             "data": data,
         })
-        self.store.put(self.EVENTS_NS, instance_id, events)
+        self.store.put(self.EVENTS_SEQ_NS, instance_id, seq + 1)
 
     # Meta helpers
     def _put_meta(self, m: InstanceMeta) -> None:
-        self.store.put(self.META_NS, m.instance_id, m.to_dict())
+        with self._index_lock:
+            prev = self._unwrap(self.store.get(self.META_NS, m.instance_id))
+            self.store.put(self.META_NS, m.instance_id, m.to_dict())
+            self._cache_meta(m.copy())
+
+            # Keep secondary indexes in sync with the stored meta
+            prev_status = prev.get("status") if prev else None
+            if prev_status != m.status:
+                if prev_status:
+                    self._index_remove(self.INDEX_BY_STATUS_NS, prev_status, m.instance_id)
+                self._index_add(self.INDEX_BY_STATUS_NS, m.status, m.instance_id)
+            if not prev:
+                self._index_add(self.INDEX_BY_CUSTOMER_NS, m.customer_id, m.instance_id)
+            prev_ts = (prev.get("last_ts") or "") if prev else None
+            ts = m.last_ts or ""
+            if prev_ts != ts:
+                self._update_recency(m.instance_id, prev_ts, ts)
+
+    def _cache_meta(self, m: InstanceMeta) -> None:
+        with self._meta_cache_lock:
+            self._meta_cache[m.instance_id] = m
+            self._meta_cache.move_to_end(m.instance_id)
+            if len(self._meta_cache) > self.META_CACHE_SIZE:
+                self._meta_cache.popitem(last=False)
 
     def _get_meta(self, instance_id: str) -> Optional[InstanceMeta]:
+        with self._meta_cache_lock:
+            m = self._meta_cache.get(instance_id)
+            if m is not None:
+                self._meta_cache.move_to_end(instance_id)
+                return m.copy()
         d = self._unwrap(self.store.get(self.META_NS, instance_id))
-        return InstanceMeta.from_dict(d) if d else None
-
-    def _update_meta_from_state(self, instance_id: str, actor: str, s: Dict[str, Any]) -> InstanceMeta:
+        if not d:
+            return None
+        m = InstanceMeta.from_dict(d)
+        with self._meta_cache_lock:
+            # A concurrent _put_meta may have cached a newer meta meanwhile
+            m = self._meta_cache.setdefault(instance_id, m)
+            if len(self._meta_cache) > self.META_CACHE_SIZE:
+                self._meta_cache.popitem(last=False)
+            return m.copy()
+
+    # Applies graph state to the stored meta; callers persist it via _put_meta
+    def _compute_meta_from_state(
+        self, instance_id: str, actor: str, s: Dict[str, Any], _now: Optional[str] = None
+    ) -> InstanceMeta:
         m = self._get_meta(instance_id)
         if not m:
             raise ValueError("Missing meta")
-        last_node = s.get("meta", {}).get("last_node")
-        status = s.get("meta", {}).get("status", m.status)
+        sm = s.get("meta") or {}
+        last_node = sm.get("last_node")
+        start_time = sm.get("start_time")
+        end_time = sm.get("end_time")
 
         m.last_actor = actor
         if last_node:
             m.last_node = last_node
-        if s.get("meta", {}).get("start_time") and not m.start_time:
-            m.start_time = s["meta"]["start_time"]
-        if s.get("meta", {}).get("end_time"):
-            m.end_time = s["meta"]["end_time"]
-        m.status = status
+        if start_time and not m.start_time:
+            m.start_time = start_time
+        if end_time:
+            m.end_time = end_time
+        m.status = sm.get("status", m.status)
 
         # Step history on node change
         prev_node = m.steps_history[-1]["node"] if m.steps_history else None
         if last_node and last_node != prev_node:
+            m.last_ts = _now or now_iso()
             m.steps_history.append({
-                "ts": now_iso(),
+                "ts": m.last_ts,
                 "node": last_node,
                 "actor": actor,
                 "status": m.status
             })
 
-        self._put_meta(m)
         return m
 
     # ---- lifecycle ----
@@ -271,7 +367,6 @@ class Engine:
         # Persist and index
         self.store.put(self.STATE_NS, instance_id, state)
         self._put_meta(meta)
-        self._add_to_index(instance_id)
         self._append_event(instance_id, "created", None, meta.status, started_by, {"customer_id": customer_id})
 
         # First run
@@ -297,15 +392,30 @@ class Engine:
             actor,
             {"updates": updates},
         )
-        return self._run(instance_id, state, actor=actor)
+        # Only the interrupted node's own key can be resumed in place; any other
+        # key (e.g. "validate": "no" at Gather Claim Info) may change an upstream
+        # route, so replay the graph from its entry point.
+        last_node = state.get("meta", {}).get("last_node")
+        bag_key = self._bag_keys.get(last_node)
+        in_place = last_node and bag_key and all(k == bag_key for k in updates)
+        return self._run(instance_id, state, actor=actor, from_node=last_node if in_place else None)
     
-    def _run(self, instance_id: str, state: Dict[str, Any], actor: str) -> Dict[str, Any]:
-        def update_and_return(payload: Dict[str, Any], state_for_meta: Dict[str, Any]):
-            meta = self._update_meta_from_state(instance_id, actor, state_for_meta)
-            self._put_meta(meta)
-            return payload
-
-        result = self.graph.invoke(state)
+    # Runs from the interrupted node instead of replaying the graph from its entry point
+    def _invoke_from(self, node: str, state: Dict[str, Any]):
+        while True:
+            result = self._nodes[node](state)
+            route = _ROUTERS.get(node)
+            nxt = route(result) if route else END
+            if nxt == END:
+                return result
+            node = nxt
+
+    def _run(
+        self, instance_id: str, state: Dict[str, Any], actor: str, from_node: Optional[str] = None
+    ) -> Dict[str, Any]:
+        result = self._invoke_from(from_node, state) if from_node else self.graph.invoke(state)
+        # One timestamp shared by the event log and step history of this run
+        ts = now_iso()
 
         # Paused (Interrupt)
         if isinstance(result, Interrupt):
@@ -313,10 +423,10 @@ class Engine:
             # Ensure last_node is set for diagram
             if not state.get("meta", {}).get("last_node"):
                 state.setdefault("meta", {})["last_node"] = "Validate Request"
-            meta = self._update_meta_from_state(instance_id, actor, state)
+            meta = self._compute_meta_from_state(instance_id, actor, state, _now=ts)
             if meta.status not in {"completed", "aborted"}:
                 meta.status = "paused"
-                self._put_meta(meta)
+            self._put_meta(meta)
             self._append_event(
                 instance_id,
                 "paused",
@@ -324,12 +434,13 @@ class Engine:
                 meta.status,
                 actor,
                 {"prompt": result.value},
+                _now=ts,
             )
-            return update_and_return({
+            return {
                 "status": "paused",
                 "prompt": result.value,
                 "instance_id": instance_id
-            }, state)
+            }
 
         if not isinstance(result, dict):
             raise TypeError("Unexpected graph result; expected dict or Interrupt")
@@ -337,46 +448,33 @@ class Engine:
         self.store.put(self.STATE_NS, instance_id, result)
         if not result.get("meta", {}).get("last_node"):
             result.setdefault("meta", {})["last_node"] = "Validate Request"
-        meta = self._update_meta_from_state(instance_id, actor, result)
+        meta = self._compute_meta_from_state(instance_id, actor, result, _now=ts)
         node = result["meta"]["last_node"]
         status = result.get("meta", {}).get("status", meta.status)
 
-        if status == "completed":
-            meta.status = "completed"
-            self._put_meta(meta)
-            self._append_event(
-                instance_id, "completed", node, meta.status, actor,
-                {"result": result.get("bag", {}).get("result")}
-            )
-            return update_and_return({
-                "status": "completed",
-                "node": node,
-                "result": result.get("bag", {}).get("result"),
-                "instance_id": instance_id,
-            }, result)
-
-        if status == "aborted":
-            meta.status = "aborted"
+        if status in {"completed", "aborted"}:
+            meta.status = status
             self._put_meta(meta)
             self._append_event(
-                instance_id, "aborted", node, meta.status, actor,
-                {"result": result.get("bag", {}).get("result")}
+                instance_id, status, node, meta.status, actor,
+                {"result": result.get("bag", {}).get("result")},
+                _now=ts,
             )
-            return update_and_return({
-                "status": "aborted",
+            return {
+                "status": status,
                 "node": node,
                 "result": result.get("bag", {}).get("result"),
                 "instance_id": instance_id,
-            }, result)
+            }
 
         meta.status = "in_progress"
         self._put_meta(meta)
-        self._append_event(instance_id, "progressed", node, meta.status, actor, {})
-        return update_and_return({
+        self._append_event(instance_id, "progressed", node, meta.status, actor, {}, _now=ts)
+        return {
             "status": "in_progress",
             "node": node,
             "instance_id": instance_id
-        }, result)
+        }
 
     # ---- run helpers ----
     # def _run(self, instance_id: str, state: Dict[str, Any], actor: str) -> Dict[str, Any]:
@@ -451,7 +549,11 @@ class Engine:
         return self._get_meta(instance_id)
 
     def history(self, instance_id: str) -> List[Dict[str, Any]]:
-        return self._unwrap(self.store.get(self.EVENTS_NS, instance_id)) or []
+        count = self._unwrap(self.store.get(self.EVENTS_SEQ_NS, instance_id)) or 0
+        return [
+            self._unwrap(self.store.get(self.EVENTS_NS, f"{instance_id}:{seq}"))
+            for seq in range(count)
+        ]
 
     def list_instances(
         self,
@@ -459,23 +561,89 @@ class Engine:
         status: Optional[str] = None,
         started_by: Optional[str] = None,
         workflow_name: Optional[str] = None,
+        last_node_in: Optional[AbstractSet[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> List[InstanceMeta]:
-        ids = self._unwrap(self.store.get(self.INDEX_NS, "instances")) or []
+        if limit is not None and limit <= 0:
+            return []
+
+        def keep(wf: str, cust: str, st: str, by: str, node: Optional[str]) -> bool:
+            return not (
+                (workflow_name and wf != workflow_name)
+                or (customer_id and cust != customer_id)
+                or (status and st != status)
+                or (started_by and by != started_by)
+                or (last_node_in is not None and node not in last_node_in)
+            )
+
+        # Narrow via secondary indexes when possible (copied under the lock,
+        # since writers update the stored values in place)
+        wanted: Optional[set] = None
+        with self._index_lock:
+            if status:
+                wanted = set(self._unwrap(self.store.get(self.INDEX_BY_STATUS_NS, status)) or {})
+            if customer_id:
+                by_customer = set(self._unwrap(self.store.get(self.INDEX_BY_CUSTOMER_NS, customer_id)) or {})
+                wanted = by_customer if wanted is None else wanted & by_customer
+
+        # Indexed query with a page size: walk recency, hydrating ids until the page is full
+        if wanted is not None and limit is not None:
+            out: List[InstanceMeta] = []
+            seen: set = set()
+            skipped = 0
+            for _, iid in reversed(self._recency_snapshot()):
+                if iid not in wanted or iid in seen:
+                    continue
+                seen.add(iid)
+                m = self._get_meta(iid)
+                if not m or not keep(m.workflow_name, m.customer_id, m.status, m.started_by, m.last_node):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                out.append(m)
+                if len(out) >= limit:
+                    break
+            return out
+
+        # Indexed query: hydrate only the matching ids, O(K log K) in the match count
+        if wanted is not None:
+            metas = [
+                m for m in (self._get_meta(iid) for iid in wanted)
+                if m and keep(m.workflow_name, m.customer_id, m.status, m.started_by, m.last_node)
+            ]
+            metas.sort(key=lambda m: (m.last_ts or "", m.instance_id), reverse=True)
+            return metas[offset:]
+
+        # Unfiltered: scan the meta namespace page by page; filter on the raw dicts
+        rows: Dict[str, Dict[str, Any]] = {}
+        scanned = 0
+        while True:
+            items = self.store.search(self.META_NS, limit=self.SCAN_PAGE_SIZE, offset=scanned)
+            for item in items:
+                d = item.value
+                if keep(d["workflow_name"], d["customer_id"], d["status"], d["started_by"], d["last_node"]):
+                    rows[item.key] = d
+            if len(items) < self.SCAN_PAGE_SIZE:
+                break
+            scanned += len(items)
+
+        # Walk the recency index newest-first; only returned rows become InstanceMeta
         out: List[InstanceMeta] = []
-        for iid in ids:
-            m = self._get_meta(iid)
-            if not m:
-                continue
-            if workflow_name and m.workflow_name != workflow_name:
-                continue
-            if customer_id and m.customer_id != customer_id:
-                continue
-            if status and m.status != status:
+        seen: set = set()
+        skipped = 0
+        for _, iid in reversed(self._recency_snapshot()):
+            d = rows.get(iid)
+            if d is None or iid in seen:
                 continue
-            if started_by and m.started_by != started_by:
+            seen.add(iid)
+            if skipped < offset:
+                skipped += 1
                 continue
-            out.append(m)
-        out.sort(key=lambda x: (x.steps_history[-1]["ts"] if x.steps_history else ""), reverse=True)
+            out.append(InstanceMeta.from_dict(d))
+            if limit is not None and len(out) >= limit:
+                break
         return out
 
 # ==========
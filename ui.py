@@ -1,18 +1,16 @@
 import json
-import threading
 import uvicorn
 import streamlit as st
 from streamlit_mermaid import st_mermaid
 from workflow_backend import engine
-from api import app  # FastAPI app
+from api import app, start_api_thread  # FastAPI app
+from workflow_diagram import workflow_mermaid
 
-# --- Start FastAPI in background thread ---
+# --- Start FastAPI in background thread (once per process) ---
 def run_api():
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
 
-if "api_started" not in st.session_state:
-    threading.Thread(target=run_api, daemon=True).start()
-    st.session_state.api_started = True
+start_api_thread(run_api)
 
 # --- Auto-refresh every 5 seconds ---
 #st_autorefresh = st.experimental_autorefresh(interval=5000, key="datarefresh")
@@ -23,48 +21,6 @@ st.title("📋 Claim Workflow Manager")
 if st.button("🔄 Refresh Workflows"):
     st.rerun()
 
-# --- Mermaid diagram helper ---
-def workflow_mermaid(meta: dict) -> str:
-    node_ids = {
-        "Validate Request": "A",
-        "Gather Claim Info": "B",
-        "Identify Accounts & Process Decision": "D",
-        "Cancel CWD Request": "C",
-        "Hold Request": "E",
-        "Apply Temporary Suppression": "F",
-        "Fulfill Case and Detect": "G",
-        "END": "H",
-    }
-    visited_styles = []
-    for step in meta.get("steps_history", []):
-        node = step.get("node")
-        if node in node_ids:
-            visited_styles.append(f"style {node_ids[node]} fill:#e3f2fd,stroke:#1565c0,stroke-width:2px;")
-    current_node = meta.get("last_node") or (
-        meta["steps_history"][0]["node"] if meta.get("steps_history") else "Validate Request"
-    )
-    if current_node in node_ids:
-        visited_styles.append(f"style {node_ids[current_node]} fill:#ffecb3,stroke:#ff6f00,stroke-width:4px;")
-    styles = "\n    ".join(visited_styles)
-    return f"""
-graph TD
-    A[Validate Request] -->|yes| B[Gather Claim Info]
-    A -->|no| C[Cancel CWD Request]
-    B --> D[Identify Accounts & Process Decision]
-    D -->|cancel| C
-    D -->|hold| E[Hold Request]
-    D -->|suppress| F[Apply Temporary Suppression]
-    E -->|resume| F
-    E -->|abort| C
-    F -->|yes| G[Fulfill Case and Detect]
-    F -->|no| C
-    G --> H[END]
-    C --> H
-    {styles}
-"""
-
-
-
 # --- Start workflow ---
 st.header("🚀 Start a New Workflow")
 with st.form("start_form"):
@@ -0,0 +1,50 @@
+# workflow_diagram.py
+# Mermaid diagram helpers for the UI. Kept out of ui.py because Streamlit
+# re-executes that script on every rerun; this module (and its cache) is imported once.
+from functools import lru_cache
+from types import MappingProxyType
+
+_NODE_IDS = MappingProxyType({
+    "Validate Request": "A",
+    "Gather Claim Info": "B",
+    "Identify Accounts & Process Decision": "D",
+    "Cancel CWD Request": "C",
+    "Hold Request": "E",
+    "Apply Temporary Suppression": "F",
+    "Fulfill Case and Detect": "G",
+    "END": "H",
+})
+
+_MERMAID_BODY = """
+graph TD
+    A[Validate Request] -->|yes| B[Gather Claim Info]
+    A -->|no| C[Cancel CWD Request]
+    B --> D[Identify Accounts & Process Decision]
+    D -->|cancel| C
+    D -->|hold| E[Hold Request]
+    D -->|suppress| F[Apply Temporary Suppression]
+    E -->|resume| F
+    E -->|abort| C
+    F -->|yes| G[Fulfill Case and Detect]
+    F -->|no| C
+    G --> H[END]
+    C --> H"""
+
+# Workflows at the same point share one diagram
+@lru_cache(maxsize=256)
+def _mermaid_for(step_nodes: tuple, current_node: str) -> str:
+    visited_styles = [
+        f"style {_NODE_IDS[node]} fill:#e3f2fd,stroke:#1565c0,stroke-width:2px;"
+        for node in step_nodes if node in _NODE_IDS
+    ]
+    if current_node in _NODE_IDS:
+        visited_styles.append(f"style {_NODE_IDS[current_node]} fill:#ffecb3,stroke:#ff6f00,stroke-width:4px;")
+    styles = "\n    ".join(visited_styles)
+    return _MERMAID_BODY + "\n    " + styles + "\n"
+
+def workflow_mermaid(meta: dict) -> str:
+    current_node = meta.get("last_node") or (
+        meta["steps_history"][0]["node"] if meta.get("steps_history") else "Validate Request"
+    )
+    step_nodes = tuple(step.get("node") for step in meta.get("steps_history", []))
+    return _mermaid_for(step_nodes, current_node)
\ No newline at end of file